@@ -1,27 +1,115 @@
-from typing import Dict, Iterable, List, Optional
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
 import click
 import requests
+from requests.adapters import HTTPAdapter
 
 # The repository is maintained at
 # https://jku.github.io/playground-baseline/
 # and published to BASE_URL:
 BASE_URL = "https://jku.github.io/playground-baseline/repository"
+TIMEOUT = 30
+MAX_WORKERS = 8
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or f"{Path.home()}/.cache", "playground-baseline"
+)
+
+_VERSION_CHARS = frozenset("0123456789.")
+
+logger = logging.getLogger(__name__)
+
+# Share one session so consecutive requests to BASE_URL reuse the connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+
+def _write_cache_file(path: str, data: bytes) -> None:
+    """Write a cache file atomically: readers never see a partial file"""
+    with NamedTemporaryFile(dir=CACHE_DIR, delete=False) as f:
+        try:
+            f.write(data)
+        except OSError:
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, path)
 
 
 def _fetch_index(project: str) -> Optional[Dict]:
-    """Fetch a project index json file, if one exists"""
-    r = requests.get(f"{BASE_URL}/{project}/index.json")
+    """Fetch a project index json file, if one exists
+
+    The index is cached in CACHE_DIR and only downloaded again if it has changed
+    """
+    # project name is not trusted to be a safe file name
+    cache_name = quote(project, safe="")
+    cached_index = os.path.join(CACHE_DIR, f"{cache_name}.json")
+    cached_etag = os.path.join(CACHE_DIR, f"{cache_name}.etag")
+
+    headers = {}
+    try:
+        with open(cached_index, "rb") as f:
+            index = json.loads(f.read())
+        with open(cached_etag) as f:
+            headers["If-None-Match"] = f.read()
+    except (OSError, ValueError):
+        # no usable cache: make an unconditional request
+        headers = {}
+
+    url = f"{BASE_URL}/{project}/index.json"
+    r = _SESSION.get(url, headers=headers, timeout=TIMEOUT)
+    if r.status_code == 304:
+        return index
     if r.status_code == 404:
         return None
     r.raise_for_status()
+
+    etag = r.headers.get("ETag")
+    if etag:
+        # the cache is best-effort: failing to write it is not an error
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # remove the old etag first so an interrupted update is never trusted
+            try:
+                os.remove(cached_etag)
+            except FileNotFoundError:
+                pass
+            _write_cache_file(cached_index, r.content)
+            _write_cache_file(cached_etag, etag.encode())
+        except OSError as e:
+            logger.debug("Failed to cache index for %s: %s", project, e)
+
     return r.json()
 
 
+def _fetch_indexes(projects: Iterable[str]) -> Dict[str, Optional[Dict]]:
+    """Fetch index json files for multiple projects concurrently"""
+    indexes = {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {executor.submit(_fetch_index, p): p for p in set(projects)}
+        for future in as_completed(futures):
+            indexes[futures[future]] = future.result()
+    return indexes
+
+
+def _version_key(version: str) -> Tuple[int, ...]:
+    """Return a sort key for a version string: "1.0.28" becomes (1, 0, 28)"""
+    # digits and dots only, and no empty components ("", ".1", "1..2", "1.")
+    parts = version.split(".")
+    if not _VERSION_CHARS.issuperset(version) or not all(parts):
+        raise ValueError(f"Invalid version {version}")
+
+    return tuple(map(int, parts))
+
+
 def _version_sort(versions: Iterable) -> List:
     """Sort list of strings using version number sort"""
-    versions = list(versions)
-    versions.sort(key=lambda s: [int(u) for u in s.split(".")])
-    return versions
+    # sort() computes each key only once, so versions are parsed once each
+    return sorted(versions, key=_version_key)
 
 
 def _find_current_artifact(versions: Dict) -> Optional[str]:
@@ -35,10 +123,23 @@ def _find_current_artifact(versions: Dict) -> Optional[str]:
 
 def _download_artifact(project: str, artifact: str) -> str:
     """Download and store artifact from given project"""
-    r = requests.get(f"{BASE_URL}/{project}/{artifact}")
-    r.raise_for_status()
-    with open(artifact, "wb") as f:
-        f.write(r.content)
+    url = f"{BASE_URL}/{project}/{artifact}"
+    with _SESSION.get(url, stream=True, timeout=TIMEOUT) as r:
+        r.raise_for_status()
+        # download to a partial file: a failed download must not leave a
+        # truncated artifact that looks complete
+        partial = f"{artifact}.part"
+        try:
+            with open(partial, "wb") as f:
+                for chunk in r.iter_content(chunk_size=65536):
+                    f.write(chunk)
+        except BaseException:
+            try:
+                os.unlink(partial)
+            except FileNotFoundError:
+                pass
+            raise
+    os.replace(partial, artifact)
     return artifact
 
 
@@ -51,12 +152,17 @@ def main() -> None:
 @click.argument("product", required=True)
 def download(product: str):
     # Figure out project name, product name and version
-    version = None
-    if "=" in product:
-        product, version = product.split("=")
-    project = product
-    if "/" in product:
-        project, product = product.split("/")
+    arg = product
+    product, sep, version_str = product.partition("=")
+    version = version_str if sep else None
+    project, sep, product_name = product.partition("/")
+    if sep:
+        product = product_name
+    if version == "" or "=" in version_str or "/" in product_name:
+        raise click.BadParameter(
+            f"expected PROJECT[/PRODUCT][=VERSION], got '{arg}'",
+            param_hint="PRODUCT",
+        )
 
     print(f"Downloading {project} / {product} = {version}...")
 
@@ -82,20 +188,23 @@ def download(product: str):
 
 
 @main.command("list")
-@click.argument("project", required=True)
-def list_(project: str):
-    print(f"Listing releases for {project}...")
-
-    index = _fetch_index(project)
-    if not index:
-        raise click.ClickException(f"Project {project} not found.")
-
-    for product, versions in index.items():
-        if not versions:
-            continue
-        # print versions in sorted order
-        version_strs = _version_sort(versions.keys())
-        print(f"* {product}={version_strs[-1]}, all releases: {version_strs}")
+@click.argument("projects", metavar="PROJECT...", nargs=-1, required=True)
+def list_(projects: List[str]):
+    indexes = _fetch_indexes(projects)
+
+    for project in projects:
+        print(f"Listing releases for {project}...")
+
+        index = indexes[project]
+        if not index:
+            raise click.ClickException(f"Project {project} not found.")
+
+        for product, versions in index.items():
+            if not versions:
+                continue
+            # print versions in sorted order
+            version_strs = _version_sort(versions.keys())
+            print(f"* {product}={version_strs[-1]}, all releases: {version_strs}")
 
 
 if __name__ == "__main__":
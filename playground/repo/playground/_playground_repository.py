@@ -2,10 +2,12 @@ import json
 import logging
 import os
 import shutil
+from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from enum import Enum, unique
-from glob import glob
 
 from securesystemslib.exceptions import UnverifiedSignatureError
 from securesystemslib.signer import (
@@ -15,13 +17,12 @@ from securesystemslib.signer import (
     SigstoreKey,
     SigstoreSigner,
 )
-from sigstore.oidc import detect_credential
-from tuf.api.exceptions import UnsignedMetadataError
 from tuf.api.metadata import (
     Key,
     Metadata,
     MetaFile,
     Root,
+    Signed,
     Snapshot,
     TargetFile,
     Targets,
@@ -33,11 +34,35 @@ from tuf.repository import AbortEdit, Repository
 # sigstore is not a supported key by default
 KEY_FOR_TYPE_AND_SCHEME[("sigstore-oidc", "Fulcio")] = SigstoreKey
 
-# TODO Add a metadata cache so we don't constantly open files
 # TODO; Signing status probably should include an error message when valid=False
 
 logger = logging.getLogger(__name__)
 
+_ONLINE_ROLES = frozenset(["timestamp", "snapshot"])
+_TOP_LEVEL_ROLES = frozenset(["root", "timestamp", "snapshot", "targets"])
+
+_CANONICAL = CanonicalJSONSerializer()
+_JSON = JSONSerializer()
+
+
+def _utcnow() -> datetime:
+    """Return current time as a naive UTC datetime, like metadata expiry"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hardlink src to dst, fall back to copying if linking is not possible"""
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+
+    try:
+        os.link(src, dst)
+    except OSError:
+        # e.g. dst is on another filesystem
+        shutil.copyfile(src, dst)
+
 
 @unique
 class State(Enum):
@@ -72,26 +97,29 @@ class SigningEventState:
     def __init__(self, file_path: str):
         self._file_path = file_path
         self._invites: dict[str, list[str]] = {}
-        if os.path.exists(file_path):
-            with open(file_path) as f:
-                data = json.load(f)
-                self._invites = data["invites"]
+        try:
+            with open(file_path, "rb") as f:
+                data = json.loads(f.read())
+            self._invites = data["invites"]
+        except FileNotFoundError:
+            pass
+
+        # invites indexed by role: rolename -> invited signers
+        self._role_invites: dict[str, list[str]] = {}
+        for invited_signer, invited_rolenames in self._invites.items():
+            for rolename in invited_rolenames:
+                self._role_invites.setdefault(rolename, []).append(invited_signer)
 
     def invited_signers_for_role(self, rolename: str) -> list[str]:
-        signers = []
-        for invited_signer, invited_rolenames in self._invites.items():
-            if rolename in invited_rolenames:
-                signers.append(invited_signer)
-        return signers
+        return self._role_invites.get(rolename, [])
 
     def roles_with_delegation_invites(self) -> set[str]:
         roles = set()
-        for invitee_roles in self._invites.values():
-            for role in invitee_roles:
-                if role in ["root", "targets"]:
-                    roles.add("root")
-                else:
-                    roles.add("targets")
+        for role in self._role_invites:
+            if role in ["root", "targets"]:
+                roles.add("root")
+            else:
+                roles.add("targets")
         return roles
 
 
@@ -107,26 +135,40 @@ class PlaygroundRepository(Repository):
         self._dir = dir
         self._prev_dir = prev_dir
 
+        # parsed metadata cache: rolename -> ((file mtime, file size), metadata)
+        self._md_cache: dict[str, tuple[tuple[int, int], Metadata]] = {}
+        # canonical signed payload cache: rolename -> (metadata, payload)
+        self._payload_cache: dict[str, tuple[Metadata, bytes]] = {}
+        # known good metadata cache: known good state does not change during a run
+        self._prev_cache: dict[str, Metadata | None] = {}
+        # online signers: keyid -> signer
+        self._signers: dict[str, Signer] = {}
+
         # read signing event state file
         self.state = SigningEventState(os.path.join(self._dir, ".signing-event-state"))
 
     def _get_filename(self, role: str) -> str:
         return f"{self._dir}/{role}.json"
 
-    def _get_keys(self, role: str, known_good: bool = False) -> list[Key]:
+    def _get_version(self, role: str) -> int:
+        """Return version of existing role metadata
+
+        Only the version is read: the metadata is not deserialized or cached.
+        """
+        with open(self._get_filename(role), "rb") as f:
+            return json.loads(f.read())["signed"]["version"]
+
+    def _get_keys(
+        self, role: str, delegator: Root | Targets | None = None
+    ) -> list[Key]:
         """Return public keys for delegated role
 
-        If known_good is True, use the keys defined in known good delegator.
-        Otherwise use keys defined in the signing event delegator.
+        If delegator is given, use the keys defined in it. Otherwise use keys
+        defined in the signing event delegator.
         """
-        if role in ["root", "timestamp", "snapshot", "targets"]:
-            if known_good:
-                delegator: Root | Targets = self._known_good_root()
-            else:
+        if delegator is None:
+            if role in _TOP_LEVEL_ROLES:
                 delegator = self.root()
-        else:
-            if known_good:
-                delegator = self._known_good_targets("targets")
             else:
                 delegator = self.targets()
 
@@ -142,12 +184,19 @@ class PlaygroundRepository(Repository):
     def open(self, role: str) -> Metadata:
         """Return existing metadata, or create new metadata
 
-        This is an implementation of Repository.open()
+        This is an implementation of Repository.open(). Existing metadata is
+        cached as long as the file is not modified: the returned metadata should
+        only be modified within edit().
         """
         fname = self._get_filename(role)
 
-        if not os.path.exists(fname):
-            if role not in ["timestamp", "snapshot"]:
+        try:
+            st: os.stat_result | None = os.stat(fname)
+        except FileNotFoundError:
+            st = None
+
+        if st is None:
+            if role not in _ONLINE_ROLES:
                 raise ValueError(f"Cannot create new {role} metadata")
             if role == "timestamp":
                 md: Metadata = Metadata(Timestamp())
@@ -160,17 +209,51 @@ class PlaygroundRepository(Repository):
             # this makes version bumping in close() simpler
             md.signed.version = 0
         else:
+            file_sig = (st.st_mtime_ns, st.st_size)
+            cached = self._md_cache.get(role)
+            if cached and cached[0] == file_sig:
+                return cached[1]
+
             with open(fname, "rb") as f:
                 md = Metadata.from_bytes(f.read())
+            self._md_cache[role] = (file_sig, md)
 
         return md
 
+    @contextmanager
+    def edit(self, role: str) -> Generator[Signed, None, None]:
+        """Implementation of Repository.edit() that keeps the metadata cache valid
+
+        The edit modifies cached metadata: drop it from cache whether the edit
+        was stored or aborted.
+        """
+        try:
+            with super().edit(role) as signed:
+                yield signed
+        finally:
+            self._invalidate(role)
+
+    def _invalidate(self, role: str) -> None:
+        """Drop cached data for role"""
+        self._md_cache.pop(role, None)
+        self._payload_cache.pop(role, None)
+
+    def _get_payload(self, role: str, md: Metadata) -> bytes:
+        """Return canonical signed payload of md (the metadata of role)"""
+        cached = self._payload_cache.get(role)
+        if cached and cached[0] is md:
+            return cached[1]
+
+        payload = _CANONICAL.serialize(md.signed)
+        self._payload_cache[role] = (md, payload)
+        return payload
+
     def signing_expiry_period(self, rolename: str) -> tuple[int, int]:
         """Extracts the signing and expiry period for a role
 
         If no signing expiry is configured, half the expiry period is used.
         """
-        if rolename in ["timestamp", "snapshot"]:
+        if rolename in _ONLINE_ROLES:
             role = self.root().get_delegated_role(rolename)
             expiry_days = role.unrecognized_fields["x-playground-expiry-period"]
             signing_days = role.unrecognized_fields.get("x-playground-signing-period")
@@ -184,6 +267,26 @@ class PlaygroundRepository(Repository):
 
         return (signing_days, expiry_days)
 
+    def _get_online_signer(self, key: Key) -> Signer:
+        """Return signer for online key
+
+        Signers are created once per run: snapshot and timestamp share the online
+        keys, and e.g. the sigstore credential detection is slow.
+        """
+        if key.keyid not in self._signers:
+            uri = key.unrecognized_fields["x-playground-online-uri"]
+            # WORKAROUND while sigstoresigner is not finished
+            if uri == "sigstore:":
+                # sigstore is slow to import and only needed for sigstore signing
+                from sigstore.oidc import detect_credential
+
+                signer = SigstoreSigner(detect_credential(), key)
+            else:
+                signer = Signer.from_priv_key_uri(uri, key)
+            self._signers[key.keyid] = signer
+
+        return self._signers[key.keyid]
+
     def close(self, rolename: str, md: Metadata) -> None:
         """Write metadata to a file in repo dir
 
@@ -193,31 +296,29 @@ class PlaygroundRepository(Repository):
 
         _, expiry_days = self.signing_expiry_period(rolename)
 
-        md.signed.expires = datetime.utcnow() + timedelta(days=expiry_days)
+        md.signed.expires = _utcnow() + timedelta(days=expiry_days)
 
         md.signatures.clear()
         for key in self._get_keys(rolename):
-            if rolename in ["timestamp", "snapshot"]:
-                uri = key.unrecognized_fields["x-playground-online-uri"]
-                # WORKAROUND while sigstoresigner is not finished
-                if uri == "sigstore:":
-                    signer = SigstoreSigner(detect_credential(), key)
-                else:
-                    signer = Signer.from_priv_key_uri(uri, key)
-                md.sign(signer, True)
+            if rolename in _ONLINE_ROLES:
+                md.sign(self._get_online_signer(key), True)
             else:
                 # offline signer, add empty sig
                 md.signatures[key.keyid] = Signature(key.keyid, "")
 
-        if rolename in ["timestamp", "snapshot"]:
+        if rolename in _ONLINE_ROLES:
             root_md: Metadata[Root] = self.open("root")
             # repository should never write unsigned online roles
             root_md.verify_delegate(rolename, md)
 
         filename = self._get_filename(rolename)
-        data = md.to_bytes(JSONSerializer())
-        with open(filename, "wb") as f:
+        data = md.to_bytes(_JSON)
+        # write a temporary file first: metadata is never left partially written
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, "wb") as f:
             f.write(data)
+        os.replace(tmp_filename, filename)
+        self._invalidate(rolename)
 
     @property
     def targets_infos(self) -> dict[str, MetaFile]:
@@ -225,7 +326,7 @@ class PlaygroundRepository(Repository):
 
         Called by snapshot() when it needs current targets versions
         """
-        # Note that this ends up loading every targets metadata. This could be
+        # Note that this ends up reading every targets metadata. This could be
         # avoided if this data was produced in the signing event (as then we
         # know which targets metadata changed). Snapshot itself should not be
         # done before the signing event PR is reviewed though as the online keys
@@ -236,7 +337,7 @@ class PlaygroundRepository(Repository):
         targets_files["targets.json"] = MetaFile(targets.version)
         if targets.delegations and targets.delegations.roles:
             for role in targets.delegations.roles.values():
-                version = self.targets(role.name).version
+                version = self._get_version(role.name)
                 targets_files[f"{role.name}.json"] = MetaFile(version)
 
         return targets_files
@@ -250,23 +351,37 @@ class PlaygroundRepository(Repository):
         return MetaFile(self.snapshot().version)
 
     def open_prev(self, role: str) -> Metadata | None:
-        """Return known good metadata for role (if it exists)"""
+        """Return known good metadata for role (if it exists)
+
+        The returned metadata is shared between callers and must not be modified.
+        """
+        if role in self._prev_cache:
+            return self._prev_cache[role]
+
         prev_fname = f"{self._prev_dir}/{role}.json"
-        if os.path.exists(prev_fname):
+        md: Metadata | None
+        try:
             with open(prev_fname, "rb") as f:
-                return Metadata.from_bytes(f.read())
+                md = Metadata.from_bytes(f.read())
+        except FileNotFoundError:
+            md = None
 
-        return None
+        self._prev_cache[role] = md
+        return md
 
     def _validate_role(
-        self, delegator: Metadata, rolename: str
+        self,
+        rolename: str,
+        md: Metadata,
+        prev_md: Metadata | None,
+        now: datetime,
+        threshold_reached: bool,
     ) -> tuple[bool, str | None]:
         """Validate role compatibility with this repository
 
+        md and prev_md are the signing event and known good versions of the role.
+        threshold_reached tells if md has enough valid signatures from the delegator.
         Returns bool for validity and optional error message"""
-        md = self.open(rolename)
-        prev_md = self.open_prev(rolename)
-
         # TODO: Current checks are more examples than actual checks
 
         # Make sure version grows if there are actual payload changes
@@ -275,7 +390,7 @@ class PlaygroundRepository(Repository):
                 return False, f"Version {md.signed.version} is not valid for {rolename}"
 
         days = md.signed.unrecognized_fields["x-playground-expiry-period"]
-        if md.signed.expires > datetime.utcnow() + timedelta(days=days):
+        if md.signed.expires > now + timedelta(days=days):
             return False, f"Expiry date is further than expected {days} days ahead"
 
         # TODO for root:
@@ -290,9 +405,8 @@ class PlaygroundRepository(Repository):
         # * check there are no delegations
         # * check that target files in metadata match the files in targets/
 
-        try:
-            delegator.verify_delegate(rolename, md)
-        except UnsignedMetadataError:
+        # Signatures were already verified by the caller: don't verify them again
+        if not threshold_reached:
             return False, None
 
         return True, None
@@ -300,65 +414,59 @@ class PlaygroundRepository(Repository):
     @staticmethod
     def _build_targets(target_dir: str, rolename: str) -> dict[str, TargetFile]:
         """Build a roles dict of TargetFile based on target files in a directory"""
-        targetfiles = {}
+        targetfiles: dict[str, TargetFile] = {}
 
         if rolename == "targets":
             root_dir = target_dir
         else:
             root_dir = os.path.join(target_dir, rolename)
 
-        for fname in glob("*", root_dir=root_dir):
-            realpath = os.path.join(root_dir, fname)
-            if not os.path.isfile(realpath):
+        try:
+            entries = list(os.scandir(root_dir))
+        except FileNotFoundError:
+            return targetfiles
+
+        for entry in entries:
+            # skip hidden files and directories
+            if entry.name.startswith(".") or not entry.is_file():
                 continue
 
             # targetpath is a URL path, not OS path
             if rolename == "targets":
-                targetpath = fname
+                targetpath = entry.name
             else:
-                targetpath = f"{rolename}/{fname}"
+                targetpath = f"{rolename}/{entry.name}"
             targetfiles[targetpath] = TargetFile.from_file(
-                targetpath, realpath, ["sha256"]
+                targetpath, entry.path, ["sha256"]
             )
 
         return targetfiles
 
-    def _known_good_root(self) -> Root:
-        """Return the Root object from the known-good repository state"""
-        assert self._prev_dir is not None
-        prev_path = os.path.join(self._prev_dir, "root.json")
-        if os.path.exists(prev_path):
-            with open(prev_path, "rb") as f:
-                md = Metadata.from_bytes(f.read())
-            assert isinstance(md.signed, Root)
-            return md.signed
-        else:
-            # this role did not exist: return an empty one for comparison purposes
-            return Root()
-
     def _known_good_targets(self, rolename: str) -> Targets:
-        """Return Targets from the known good version (signing event start point)"""
+        """Return Targets from the known good version (signing event start point)
+
+        The returned object is shared between callers and must not be modified.
+        """
         assert self._prev_dir
-        prev_path = os.path.join(self._prev_dir, f"{rolename}.json")
-        if os.path.exists(prev_path):
-            with open(prev_path, "rb") as f:
-                md = Metadata.from_bytes(f.read())
-            assert isinstance(md.signed, Targets)
-            return md.signed
-        else:
+        md = self.open_prev(rolename)
+        if md is None:
             # this role did not exist: return an empty one for comparison purposes
             return Targets()
 
+        assert isinstance(md.signed, Targets)
+        return md.signed
+
     def _get_target_changes(self, rolename: str) -> list[TargetState]:
         """Compare targetfiles in known good version and signing event version:
         return list of changes"""
 
-        if rolename in ["root", "timestamp", "snapshot"]:
+        if rolename == "root" or rolename in _ONLINE_ROLES:
             return []
 
         changes = []
 
-        known_good_targetfiles = self._known_good_targets(rolename).targets
+        # copy: the known good targets are cached and must not be modified
+        known_good_targetfiles = dict(self._known_good_targets(rolename).targets)
         for targetfile in self.targets(rolename).targets.values():
             if targetfile.path not in known_good_targetfiles:
                 # new in signing event
@@ -377,7 +485,7 @@ class PlaygroundRepository(Repository):
         return changes
 
     def _get_signing_status(
-        self, rolename: str, known_good: bool
+        self, rolename: str, known_good: bool, now: datetime
     ) -> SigningStatus | None:
         """Build signing status for role.
 
@@ -389,6 +497,7 @@ class PlaygroundRepository(Repository):
         invites = set()
         sigs = set()
         missing_sigs = set()
+        valid_keyids = set()
         md = self.open(rolename)
 
         # Find delegating metadata. For root handle the special case of known good
@@ -420,13 +529,21 @@ class PlaygroundRepository(Repository):
         role = delegator.signed.get_delegated_role(rolename)
 
         # Build lists of signed signers and not signed signers
-        for key in self._get_keys(rolename, known_good):
+        payload = self._get_payload(rolename, md)
+        signatures = md.signatures
+        for key in self._get_keys(rolename, delegator=delegator.signed):
             keyowner = key.unrecognized_fields["x-playground-keyowner"]
+            sig = signatures.get(key.keyid)
+            # empty signatures are placeholders: no need to verify them
+            if sig is None or not sig.signature:
+                missing_sigs.add(keyowner)
+                continue
+
             try:
-                payload = CanonicalJSONSerializer().serialize(md.signed)
-                key.verify_signature(md.signatures[key.keyid], payload)
+                key.verify_signature(sig, payload)
                 sigs.add(keyowner)
-            except (KeyError, UnverifiedSignatureError):
+                valid_keyids.add(key.keyid)
+            except UnverifiedSignatureError:
                 missing_sigs.add(keyowner)
 
         # Document changes to targets metadata in this signing event
@@ -436,7 +553,11 @@ class PlaygroundRepository(Repository):
         if invites:
             valid, msg = False, None
         else:
-            valid, msg = self._validate_role(delegator, rolename)
+            prev_md = self.open_prev(rolename)
+            threshold_reached = len(valid_keyids) >= role.threshold
+            valid, msg = self._validate_role(
+                rolename, md, prev_md, now, threshold_reached
+            )
 
         return SigningStatus(
             invites, sigs, missing_sigs, role.threshold, target_changes, valid, msg
@@ -448,16 +569,27 @@ class PlaygroundRepository(Repository):
         In case of root, another SigningStatus may be returned for the previous
         'known good' root.
         Uses .signing-event-state file."""
-        if rolename in ["timestamp", "snapshot"]:
+        if rolename in _ONLINE_ROLES:
             raise ValueError("Not supported for online metadata")
 
-        known_good_status = self._get_signing_status(rolename, known_good=True)
-        signing_event_status = self._get_signing_status(rolename, known_good=False)
+        # use same time for validating both versions
+        now = _utcnow()
+        known_good_status = self._get_signing_status(rolename, True, now)
+        signing_event_status = self._get_signing_status(rolename, False, now)
         assert signing_event_status is not None
 
         return signing_event_status, known_good_status
 
     def publish(self, directory: str, metadata_path: str, targets_path: str):
+        """Copy the metadata and target files into a publishable directory
+
+        Metadata is copied. Target files are hardlinked to the files in targets/
+        when possible: the published target files must never be modified in place,
+        as that would modify the repository content too. The publish directory is
+        only uploaded as a Pages artifact. Published target files are named by
+        their hashes, so nothing should ever edit them.
+        """
+
         def clean_path(p: str):
             if p.startswith("/"):
                 return p[1:]
@@ -476,33 +608,61 @@ class PlaygroundRepository(Repository):
         else:
             targets_dir = os.path.join(directory, targets_path)
 
-        os.makedirs(metadata_dir, exist_ok=True)
+        # Collect the files to publish as (source, destination) pairs.
+        # Metadata is copied, hash-prefixed target files are linked
+        files: list[tuple[str, str]] = []
+        target_files: list[tuple[str, str]] = []
+        dirs = {metadata_dir}
 
-        for src_path in glob(os.path.join(self._dir, "root_history", "*.root.json")):
-            shutil.copy(src_path, metadata_dir)
-        shutil.copy(os.path.join(self._dir, "timestamp.json"), metadata_dir)
+        with os.scandir(os.path.join(self._dir, "root_history")) as entries:
+            for entry in entries:
+                if entry.name.endswith(".root.json"):
+                    dst_path = os.path.join(metadata_dir, entry.name)
+                    files.append((entry.path, dst_path))
+        dst_path = os.path.join(metadata_dir, "timestamp.json")
+        files.append((os.path.join(self._dir, "timestamp.json"), dst_path))
 
         snapshot = self.snapshot()
         dst_path = os.path.join(metadata_dir, f"{snapshot.version}.snapshot.json")
-        shutil.copy(os.path.join(self._dir, "snapshot.json"), dst_path)
+        files.append((os.path.join(self._dir, "snapshot.json"), dst_path))
 
         for filename, metafile in snapshot.meta.items():
             src_path = os.path.join(self._dir, filename)
             dst_path = os.path.join(metadata_dir, f"{metafile.version}.{filename}")
-            shutil.copy(src_path, dst_path)
+            files.append((src_path, dst_path))
 
             targets = self.targets(filename[: -len(".json")])
             for target in targets.targets.values():
                 parent, sep, name = target.path.rpartition("/")
-                os.makedirs(os.path.join(targets_dir, parent), exist_ok=True)
+                dirs.add(os.path.join(targets_dir, parent))
                 src_path = os.path.join(self._dir, "..", "targets", parent, name)
                 for hash in target.hashes.values():
                     dst_path = os.path.join(targets_dir, parent, f"{hash}.{name}")
-                    shutil.copy(src_path, dst_path)
+                    target_files.append((src_path, dst_path))
+
+        for dir in dirs:
+            os.makedirs(dir, exist_ok=True)
+
+        # The file operations are independent I/O: run them in a thread pool
+        workers = min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            copies = executor.map(
+                shutil.copyfile,
+                [src for src, _ in files],
+                [dst for _, dst in files],
+            )
+            links = executor.map(
+                _link_or_copy,
+                [src for src, _ in target_files],
+                [dst for _, dst in target_files],
+            )
+            # consume results to raise possible errors
+            list(copies)
+            list(links)
 
     def bump_expiring(self, rolename: str) -> int | None:
         """Create a new version of role if it is about to expire"""
-        now = datetime.utcnow()
+        now = _utcnow()
         bumped = True
 
         with self.edit(rolename) as signed:
@@ -518,7 +678,7 @@ class PlaygroundRepository(Repository):
         return signed.version if bumped else None
 
     def update_targets(self, rolename: str) -> bool:
-        if rolename in ["root", "timestamp", "snapshot"]:
+        if rolename == "root" or rolename in _ONLINE_ROLES:
             return False
 
         new_target_dict = self._build_targets(
@@ -3,9 +3,9 @@
 """Command line tool to version bump roles that are about to expire"""
 
 import logging
+import os
 import subprocess
 import sys
-from glob import glob
 
 import click
 
@@ -22,8 +22,14 @@ def _git(cmd: list[str]) -> subprocess.CompletedProcess:
         "-c",
         "user.email=41898282+github-actions[bot]@users.noreply.github.com",
     ] + cmd
-    proc = subprocess.run(cmd, check=True, capture_output=True, text=True)
-    logger.debug("%s:\n%s", cmd, proc.stdout)
+    # stdout is only needed for debug logging: don't capture it otherwise
+    debug = logger.isEnabledFor(logging.DEBUG)
+    stdout = subprocess.PIPE if debug else subprocess.DEVNULL
+    proc = subprocess.run(
+        cmd, check=True, stdout=stdout, stderr=subprocess.PIPE, text=True
+    )
+    if debug:
+        logger.debug("%s:\n%s", cmd, proc.stdout)
     return proc
 
 
@@ -92,7 +98,9 @@ def bump_offline(verbose: int, push: bool) -> None:
 
     repo = PlaygroundRepository("metadata")
     events = []
-    for filename in glob("*.json", root_dir="metadata"):
+    # list files before the loop: bump_expiring() writes into the directory
+    filenames = [e.name for e in os.scandir("metadata") if e.name.endswith(".json")]
+    for filename in filenames:
         if filename in ["timestamp.json", "snapshot.json"]:
             continue
 
@@ -105,16 +113,22 @@ def bump_offline(verbose: int, push: bool) -> None:
         msg = f"Periodic version bump: {rolename} v{version}"
         event = f"sign/{rolename}-v{version}"
         ref = f"refs/remotes/origin/{event}" if push else f"refs/heads/{event}"
-        _git(["commit", "-m", msg, "--", f"metadata/{rolename}.json"])
         try:
             _git(["show-ref", "--quiet", "--verify", ref])
-            logging.debug("Signing event branch %s already exists", event)
         except subprocess.CalledProcessError:
-            events.append(event)
-            if push:
-                _git(["push", "origin", f"HEAD:{event}"])
-            else:
-                _git(["branch", event])
+            pass
+        else:
+            # nothing to commit: just undo the version bump
+            logging.debug("Signing event branch %s already exists", event)
+            _git(["checkout", "HEAD", "--", f"metadata/{rolename}.json"])
+            continue
+
+        _git(["commit", "-m", msg, "--", f"metadata/{rolename}.json"])
+        events.append(event)
+        if push:
+            _git(["push", "origin", f"HEAD:{event}"])
+        else:
+            _git(["branch", event])
 
         # get back to original HEAD (before we commited)
         _git(["reset", "--hard", "HEAD^"])
@@ -5,17 +5,20 @@
 import filecmp
 import logging
 import os
+import stat
 import subprocess
 import sys
-from glob import glob
 from tempfile import TemporaryDirectory
 
 import click
 
-from playground._playground_repository import PlaygroundRepository
+from playground._playground_repository import PlaygroundRepository, SigningEventState
 
 logger = logging.getLogger(__name__)
 
+_ROLE_ORDER = {"root": 0, "targets": 1}
+_CMP_BLOCK_SIZE = 1024 * 1024
+
 
 def _git(cmd: list[str]) -> subprocess.CompletedProcess:
     cmd = [
@@ -38,52 +41,114 @@ def _find_changed_roles(known_good_dir: str, signing_event_dir: str) -> set[str]
     # find the files that have changed or been added
     # TODO what about removed roles?
 
-    files = glob("*.json", root_dir=signing_event_dir)
+    files = [e.name for e in os.scandir(signing_event_dir) if e.name.endswith(".json")]
     changed_roles = set()
     for fname in files:
-        if not os.path.exists(f"{known_good_dir}/{fname}") or not filecmp.cmp(
-            f"{signing_event_dir}/{fname}", f"{known_good_dir}/{fname}", shallow=False
-        ):
-            if fname in ["timestamp.json", "snapshot.json"]:
-                raise RuntimeError("Unexpected change in online files")
+        # filecmp compares file sizes before reading contents
+        try:
+            if filecmp.cmp(
+                f"{signing_event_dir}/{fname}",
+                f"{known_good_dir}/{fname}",
+                shallow=False,
+            ):
+                continue
+        except FileNotFoundError:
+            pass
+
+        if fname in ["timestamp.json", "snapshot.json"]:
+            raise RuntimeError("Unexpected change in online files")
 
-            changed_roles.add(fname[: -len(".json")])
+        changed_roles.add(fname[: -len(".json")])
 
     return changed_roles
 
 
+def _cmp_files(path1: str, path2: str) -> bool:
+    """Return True if both are regular files with identical contents
+
+    Like filecmp.cmp(shallow=False) but compares in larger blocks: target files
+    may be large. Raises FileNotFoundError if either file does not exist.
+    """
+    st1 = os.stat(path1)
+    st2 = os.stat(path2)
+    if not stat.S_ISREG(st1.st_mode) or not stat.S_ISREG(st2.st_mode):
+        return False
+    if st1.st_size != st2.st_size:
+        return False
+
+    with open(path1, "rb") as f1, open(path2, "rb") as f2:
+        while True:
+            block1 = f1.read(_CMP_BLOCK_SIZE)
+            if block1 != f2.read(_CMP_BLOCK_SIZE):
+                return False
+            if not block1:
+                return True
+
+
+def _list_targets(targets_dir: str) -> dict[str, bool]:
+    """Return paths in targets dir (top level and one level deep) mapped to is_dir
+
+    Hidden files are skipped.
+    """
+    paths: dict[str, bool] = {}
+    try:
+        entries = list(os.scandir(targets_dir))
+    except FileNotFoundError:
+        return paths
+
+    for entry in entries:
+        if entry.name.startswith("."):
+            continue
+        is_dir = entry.is_dir()
+        paths[entry.name] = is_dir
+        if is_dir:
+            for subentry in os.scandir(entry.path):
+                if not subentry.name.startswith("."):
+                    paths[f"{entry.name}/{subentry.name}"] = subentry.is_dir()
+
+    return paths
+
+
 def _find_changed_target_roles(
     known_good_targets_dir: str, targets_dir: str
 ) -> set[str]:
-    files = (
-        glob("*", root_dir=targets_dir)
-        + glob("*/*", root_dir=targets_dir)
-        + glob("*", root_dir=known_good_targets_dir)
-        + glob("*/*", root_dir=known_good_targets_dir)
-    )
+    # directory entries cache the file type: no need to stat for isdir() checks
+    paths = _list_targets(targets_dir)
+    known_good_paths = _list_targets(known_good_targets_dir)
     changed_roles = set()
-    for filepath in files:
+    for filepath in paths.keys() | known_good_paths.keys():
+        # "targets" is a special case: its artifacts are in the top level dir
+        rolename, sep, _ = filepath.partition("/")
+        if not sep:
+            rolename = "targets"
+
+        is_dir = paths.get(filepath)
+        known_good_is_dir = known_good_paths.get(filepath)
+        if is_dir or known_good_is_dir:
+            # Directory contents are compared as separate entries. A directory
+            # that replaces a file (or vice versa) is a changed target though
+            if is_dir is not None and known_good_is_dir is not None:
+                if is_dir != known_good_is_dir:
+                    changed_roles.add(rolename)
+            continue
+
         f1 = os.path.join(targets_dir, filepath)
         f2 = os.path.join(known_good_targets_dir, filepath)
-        if os.path.isdir(f1) and os.path.isdir(f2):
-            continue
 
         try:
-            if filecmp.cmp(f1, f2, shallow=False):
+            if _cmp_files(f1, f2):
                 continue
         except FileNotFoundError:
             pass
 
-        # found a changed target, add rolename to list. "targets" is a special case
-        rolename, _, _ = filepath.rpartition(filepath)
-        if not rolename:
-            rolename = "targets"
+        # found a changed target, add rolename to list
         changed_roles.add(rolename)
 
     return changed_roles
 
 
 def _role_status(repo: PlaygroundRepository, role: str, event_name) -> bool:
+    output = []
     status, prev_status = repo.status(role)
     role_is_valid = status.valid
     sig_counts = f"{len(status.signed)}/{status.threshold}"
@@ -97,51 +162,57 @@ def _role_status(repo: PlaygroundRepository, role: str, event_name) -> bool:
         signed = signed | prev_status.signed
         missing = missing | prev_status.missing
 
+    # sort signer names: set order is not stable between runs
+    signers = ", ".join(sorted(signed))
+    missing_signers = ", ".join(sorted(missing))
+
     if role_is_valid and not status.invites:
         emoji = "heavy_check_mark"
     else:
         emoji = "x"
-    click.echo(f"#### :{emoji}: {role}")
+    output.append(f"#### :{emoji}: {role}")
 
     if status.invites:
-        click.echo(
+        output.append(
             f"{role} delegations have open invites ({', '.join(status.invites)})."
         )
-        click.echo(
+        output.append(
             "Invitees can accept the invitations by running "
             f"`playground-sign {event_name}`"
         )
 
     if not status.invites:
         if status.target_changes:
-            click.echo(f"{role} contains following target file changes:")
+            output.append(f"{role} contains following target file changes:")
             for target_state in status.target_changes:
-                click.echo(f" * {target_state}")
-            click.echo("")
+                output.append(f" * {target_state}")
+            output.append("")
 
         if role_is_valid:
-            click.echo(
+            output.append(
                 f"{role} is verified and signed by {sig_counts} signers "
-                f"({', '.join(signed)})."
+                f"({signers})."
             )
         elif signed:
-            click.echo(
+            output.append(
                 f"{role} is not yet verified. It is signed by {sig_counts} signers "
-                f"({', '.join(signed)})."
+                f"({signers})."
             )
         else:
-            click.echo(f"{role} is unsigned and not yet verified")
+            output.append(f"{role} is unsigned and not yet verified")
 
         if missing:
-            click.echo(f"Still missing signatures from {', '.join(missing)}")
-            click.echo(
+            output.append(f"Still missing signatures from {missing_signers}")
+            output.append(
                 "Signers can sign these changes by running "
                 f"`playground-sign {event_name}`"
             )
 
     if status.message:
-        click.echo(f"**Error**: {status.message}")
+        output.append(f"**Error**: {status.message}")
 
+    # print the role status in one go
+    click.echo("\n".join(output))
     return role_is_valid and not status.invites
 
 
@@ -171,8 +242,25 @@ def status(verbose: int, push: bool) -> None:
         click.echo("This signing event contains no changes yet")
         sys.exit(1)
 
+    # Skip the known good checkout if there are no metadata or artifact changes
+    # and no invites: there would be no roles to report on. git diff compares the
+    # working tree (not just HEAD) but does not list untracked files
+    changed = _git(["diff", "--name-only", merge_base, "--", "metadata", "targets"])
+    untracked = _git(
+        ["ls-files", "--others", "--exclude-standard", "--", "metadata", "targets"]
+    )
+    state = SigningEventState("metadata/.signing-event-state")
+    if (
+        not changed.stdout
+        and not untracked.stdout
+        and not state.roles_with_delegation_invites()
+    ):
+        if push:
+            _git(["push", "origin", event_name])
+        sys.exit(0)
+
     with TemporaryDirectory() as known_good_dir:
-        _git(["clone", "--quiet", ".", known_good_dir])
+        _git(["clone", "--quiet", "--shared", "--no-checkout", ".", known_good_dir])
         _git(["-C", known_good_dir, "checkout", "--quiet", merge_base])
 
         good_metadata = os.path.join(known_good_dir, "metadata")
@@ -183,20 +271,25 @@ def status(verbose: int, push: bool) -> None:
         # Print status for each role, count invalid roles
         repo = PlaygroundRepository("metadata", good_metadata)
 
-        # first create a list of roles with metadata or artifact changes or invites
-        roles = list(
+        # first find the roles with metadata or artifact changes or invites
+        roles = (
             _find_changed_roles(good_metadata, "metadata")
             | _find_changed_target_roles(good_targets, "targets")
             | repo.state.roles_with_delegation_invites()
         )
-        # reorder, toplevels first
-        for toplevel in ["targets", "root"]:
-            if toplevel in roles:
-                roles.remove(toplevel)
-                roles.insert(0, toplevel)
 
         # Update metadata if necessary. Output the roles current status
-        for role in roles:
+        # toplevels first (root, then targets), then other roles in name order
+        for role in sorted(roles, key=lambda role: (_ROLE_ORDER.get(role, 2), role)):
+            if not os.path.exists(f"metadata/{role}.json"):
+                # artifact changes for a role without metadata: if the artifacts
+                # were removed along with the role, there is nothing to report
+                if os.path.exists(f"targets/{role}"):
+                    click.echo(f"#### :x: {role}")
+                    click.echo(f"{role} has artifacts but the role does not exist")
+                    success = False
+                continue
+
             if repo.update_targets(role):
                 # metadata and artifacts are not in sync
                 msg = f"Update targets metadata for role {role}"
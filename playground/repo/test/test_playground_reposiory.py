@@ -1,6 +1,21 @@
+import json
+import os
+import shutil
 import unittest
+from datetime import timedelta
+from tempfile import TemporaryDirectory
 
-from playground._playground_repository import PlaygroundRepository
+from securesystemslib.signer import CryptoSigner, Signature
+from tuf.api.metadata import Metadata, Root, Targets
+from tuf.api.serialization.json import JSONSerializer
+from tuf.repository import AbortEdit
+
+from playground._playground_repository import (
+    PlaygroundRepository,
+    SigningEventState,
+    SigningStatus,
+    _utcnow,
+)
 
 
 class TestPlaygroundRepository(unittest.TestCase):
@@ -36,6 +51,126 @@ class TestPlaygroundRepository(unittest.TestCase):
         self.assertEqual(signing_days, 2)
         self.assertEqual(expiry_days, 4)
 
+    def test_open_cached(self):
+        repo = PlaygroundRepository("test/test_repo1")
+
+        md = repo.open("targets")
+        self.assertIs(repo.open("targets"), md)
+
+    def test_open_modified_file(self):
+        with TemporaryDirectory() as tmpdir:
+            for fname in os.listdir("test/test_repo1"):
+                shutil.copy(os.path.join("test/test_repo1", fname), tmpdir)
+            repo = PlaygroundRepository(tmpdir)
+            self.assertEqual(repo.targets().version, 1)
+
+            # rewrite the file outside of the repository
+            path = os.path.join(tmpdir, "targets.json")
+            with open(path) as f:
+                data = json.load(f)
+            data["signed"]["version"] = 100
+            with open(path, "w") as f:
+                json.dump(data, f)
+
+            self.assertEqual(repo.targets().version, 100)
+
+    def test_open_after_close(self):
+        with TemporaryDirectory() as tmpdir:
+            for fname in os.listdir("test/test_repo1"):
+                shutil.copy(os.path.join("test/test_repo1", fname), tmpdir)
+            repo = PlaygroundRepository(tmpdir)
+            md = repo.open("targets")
+            self.assertEqual(md.signed.version, 1)
+
+            # close() writes a new version of the file
+            repo.close("targets", Metadata.from_bytes(md.to_bytes()))
+            self.assertEqual(repo.targets().version, 2)
+
+    def test_open_prev_cached(self):
+        repo = PlaygroundRepository("test/test_repo2", "test/test_repo1")
+
+        md = repo.open_prev("targets")
+        self.assertIs(repo.open_prev("targets"), md)
+        self.assertIsNone(repo.open_prev("no-such-role"))
+
+    def test_aborted_edit_not_cached(self):
+        repo = PlaygroundRepository("test/test_repo1")
+
+        version = repo.targets().version
+        with repo.edit_targets() as targets:
+            targets.version += 10
+            raise AbortEdit
+        self.assertEqual(repo.targets().version, version)
+
+    def test_get_version(self):
+        repo = PlaygroundRepository("test/test_repo1")
+
+        self.assertEqual(repo._get_version("targets"), repo.targets().version)
+
+    def test_invited_signers_for_role(self):
+        with TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, ".signing-event-state")
+            with open(path, "w") as f:
+                invites = {"@user1": ["root", "targets"], "@user2": ["targets"]}
+                json.dump({"invites": invites}, f)
+            state = SigningEventState(path)
+
+        self.assertEqual(state.invited_signers_for_role("root"), ["@user1"])
+        self.assertEqual(
+            state.invited_signers_for_role("targets"), ["@user1", "@user2"]
+        )
+        self.assertEqual(state.invited_signers_for_role("role1"), [])
+        self.assertEqual(state.roles_with_delegation_invites(), {"root"})
+
+    def _targets_status(self, root: Root, targets: Metadata) -> SigningStatus:
+        with TemporaryDirectory() as dir, TemporaryDirectory() as prev_dir:
+            Metadata(root).to_file(os.path.join(dir, "root.json"), JSONSerializer())
+            targets.to_file(os.path.join(dir, "targets.json"), JSONSerializer())
+            repo = PlaygroundRepository(dir, prev_dir)
+            status, _ = repo.status("targets")
+        return status
+
+    def test_status_threshold(self):
+        signers = []
+        for owner in ["@user1", "@user2", "@user3"]:
+            signer = CryptoSigner.generate_ed25519()
+            signer.public_key.unrecognized_fields["x-playground-keyowner"] = owner
+            signers.append(signer)
+
+        # targets requires signatures from both user1 and user2: user3 is not
+        # authorized to sign targets
+        root = Root()
+        for signer in signers[:2]:
+            root.add_key(signer.public_key, "targets")
+        root.roles["targets"].threshold = 2
+
+        targets = Targets(expires=_utcnow() + timedelta(days=1))
+        targets.unrecognized_fields["x-playground-expiry-period"] = 30
+
+        for signer_indices, valid in [
+            ([], False),
+            ([0], False),
+            ([0, 2], False),  # signature from unauthorized key does not count
+            ([0, 1], True),
+        ]:
+            md = Metadata(targets)
+            for i in signer_indices:
+                md.sign(signers[i], append=True)
+            status = self._targets_status(root, md)
+            self.assertEqual(status.valid, valid, signer_indices)
+
+        # signature from unauthorized key, claiming to be from user2
+        md = Metadata(targets)
+        forged = md.sign(signers[2])
+        md.sign(signers[0], append=True)
+        del md.signatures[forged.keyid]
+        keyid = signers[1].public_key.keyid
+        md.signatures[keyid] = Signature(keyid, forged.signature)
+        status = self._targets_status(root, md)
+        self.assertFalse(status.valid)
+        self.assertEqual(status.signed, {"@user1"})
+        self.assertEqual(status.missing, {"@user2"})
+
     # def test_bump_expires_expired(self):
     #     repo = PlaygroundRepository("test/test_repo1")
     #     ver = repo.bump_expiring("timestamp")
@@ -0,0 +1,85 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from playground.status import _find_changed_target_roles
+
+
+class TestStatus(unittest.TestCase):
+    def _write(self, path: str, content: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_find_changed_target_roles(self):
+        with TemporaryDirectory() as known_good, TemporaryDirectory() as current:
+            for targets_dir in [known_good, current]:
+                self._write(os.path.join(targets_dir, "file1"), "data")
+                self._write(os.path.join(targets_dir, "role1", "file2"), "data")
+                self._write(os.path.join(targets_dir, "role2", "file3"), "data")
+            self.assertEqual(_find_changed_target_roles(known_good, current), set())
+
+            # modified artifact in a delegated role
+            self._write(os.path.join(current, "role1", "file2"), "changed data")
+            self.assertEqual(_find_changed_target_roles(known_good, current), {"role1"})
+
+            # new artifact in top-level targets
+            self._write(os.path.join(current, "file4"), "data")
+            self.assertEqual(
+                _find_changed_target_roles(known_good, current), {"role1", "targets"}
+            )
+
+    def test_find_changed_target_roles_top_level_file(self):
+        with TemporaryDirectory() as known_good, TemporaryDirectory() as current:
+            for targets_dir in [known_good, current]:
+                self._write(os.path.join(targets_dir, "file1"), "data")
+                self._write(os.path.join(targets_dir, "role1", "file2"), "data")
+
+            # modified artifact in top-level targets
+            self._write(os.path.join(current, "file1"), "changed data")
+            self.assertEqual(
+                _find_changed_target_roles(known_good, current), {"targets"}
+            )
+
+    def test_find_changed_target_roles_removed_file(self):
+        with TemporaryDirectory() as known_good, TemporaryDirectory() as current:
+            for targets_dir in [known_good, current]:
+                self._write(os.path.join(targets_dir, "file1"), "data")
+                self._write(os.path.join(targets_dir, "role1", "file2"), "data")
+            self._write(os.path.join(known_good, "role1", "file3"), "data")
+            self._write(os.path.join(known_good, "file4"), "data")
+
+            # artifacts removed from a delegated role and from top-level targets
+            self.assertEqual(
+                _find_changed_target_roles(known_good, current), {"role1", "targets"}
+            )
+
+    def test_find_changed_target_roles_dir_in_one_tree(self):
+        with TemporaryDirectory() as known_good, TemporaryDirectory() as current:
+            for targets_dir in [known_good, current]:
+                self._write(os.path.join(targets_dir, "file1"), "data")
+            self._write(os.path.join(current, "role1", "file2"), "data")
+            self._write(os.path.join(known_good, "role2", "file3"), "data")
+
+            # new and removed role directories do not change top-level targets
+            self.assertEqual(
+                _find_changed_target_roles(known_good, current), {"role1", "role2"}
+            )
+
+            # an empty directory contains no artifacts
+            os.mkdir(os.path.join(current, "role3"))
+            self.assertEqual(
+                _find_changed_target_roles(known_good, current), {"role1", "role2"}
+            )
+
+            # a file replaced by a directory is a top-level targets change
+            os.remove(os.path.join(current, "file1"))
+            os.mkdir(os.path.join(current, "file1"))
+            self.assertEqual(
+                _find_changed_target_roles(known_good, current),
+                {"role1", "role2", "targets"},
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,6 +8,7 @@ import sys
 from collections.abc import Generator
 from configparser import ConfigParser
 from contextlib import contextmanager
+from functools import cache
 from tempfile import TemporaryDirectory
 
 import click
@@ -19,10 +20,9 @@ from playground_sign._signer_repository import SignerRepository
 class SignerConfig:
     def __init__(self, path: str):
         config = ConfigParser()
-        config.read(path)
 
         # TODO: create config if missing, ask/confirm values from user
-        if not config:
+        if not config.read(path):
             raise click.ClickException(f"Settings file {path} not found")
         try:
             self.user_name = config["settings"]["user-name"]
@@ -37,7 +37,7 @@ class SignerConfig:
 def signing_event(
     name: str, config: SignerConfig
 ) -> Generator[SignerRepository, None, None]:
-    toplevel = git(["rev-parse", "--show-toplevel"])
+    toplevel = git_toplevel()
 
     # PyKCS11 (Yubikey support) needs the module path
     # TODO: if config is not set, complain/ask the user?
@@ -57,16 +57,28 @@ def signing_event(
         with TemporaryDirectory() as temp_dir:
             base_sha = git_expect(["merge-base", f"{config.pull_remote}/main", "HEAD"])
             event_sha = git_expect(["rev-parse", "HEAD"])
-            git_expect(["clone", "--quiet", toplevel, temp_dir])
-            git_expect(["-C", temp_dir, "checkout", "--quiet", base_sha])
-            base_metadata_dir = os.path.join(temp_dir, "metadata")
-            metadata_dir = os.path.join(toplevel, "metadata")
-
-            click.echo(bold_blue(f"Signing event {name} (commit {event_sha[:7]})"))
-            repo = SignerRepository(
-                metadata_dir, base_metadata_dir, config.user_name, get_secret_input
+            # A detached worktree shares the object database: no need to clone
+            base_dir = os.path.join(temp_dir, "base")
+            git_expect(
+                ["worktree", "add", "--quiet", "--no-checkout", "--detach"]
+                + [base_dir, base_sha]
             )
-            yield repo
+            try:
+                # Only metadata is read from the base commit: check out nothing else.
+                # The base commit may not contain metadata yet
+                if git_expect(["-C", base_dir, "ls-tree", "HEAD", "metadata"]):
+                    checkout_cmd = ["checkout", "--quiet", "HEAD", "--", "metadata"]
+                    git_expect(["-C", base_dir] + checkout_cmd)
+                base_metadata_dir = os.path.join(base_dir, "metadata")
+                metadata_dir = os.path.join(toplevel, "metadata")
+
+                click.echo(bold_blue(f"Signing event {name} (commit {event_sha[:7]})"))
+                repo = SignerRepository(
+                    metadata_dir, base_metadata_dir, config.user_name, get_secret_input
+                )
+                yield repo
+            finally:
+                git_expect(["worktree", "remove", "--force", base_dir])
     finally:
         # go back to original branch
         git_expect(["checkout", "-"])
@@ -137,6 +149,15 @@ def git(cmd: list[str]) -> str:
     return proc.stdout.strip()
 
 
+@cache
+def git_toplevel() -> str:
+    """Return the repository top level directory
+
+    This is cached: the working directory does not change during a run.
+    """
+    return git_expect(["rev-parse", "--show-toplevel"])
+
+
 def git_expect(cmd: list[str]) -> str:
     """Run git, expect success"""
     try:
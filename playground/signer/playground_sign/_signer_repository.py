@@ -6,12 +6,11 @@ import filecmp
 import json
 import logging
 import os
-from collections.abc import Callable
-from contextlib import AbstractContextManager
+from collections.abc import Callable, Generator
+from contextlib import AbstractContextManager, contextmanager
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from enum import Enum, unique
-from glob import glob
 
 import click
 from securesystemslib.exceptions import UnverifiedSignatureError
@@ -39,6 +38,12 @@ from tuf.repository import AbortEdit, Repository
 
 logger = logging.getLogger(__name__)
 
+_ONLINE_ROLES = frozenset(["timestamp", "snapshot"])
+_TOP_LEVEL_ROLES = frozenset(["root", "timestamp", "snapshot", "targets"])
+_ROLE_ORDER = {"root": 0, "targets": 1}
+_CANONICAL = CanonicalJSONSerializer()
+_JSON = JSONSerializer()
+
 # Enable experimental sigstore keys
 KEY_FOR_TYPE_AND_SCHEME[("sigstore-oidc", "Fulcio")] = SigstoreKey
 SIGNER_FOR_URI_SCHEME[SigstoreSigner.SCHEME] = SigstoreSigner
@@ -76,23 +81,27 @@ def blue(text: str) -> str:
 
 def _find_changed_roles(known_good_dir: str, signing_event_dir: str) -> list[str]:
     """Return list of roles that exist and have changed in this signing event"""
-    files = glob("*.json", root_dir=signing_event_dir)
+    files = [e.name for e in os.scandir(signing_event_dir) if e.name.endswith(".json")]
     changed_roles = []
     for fname in files:
-        if not os.path.exists(f"{known_good_dir}/{fname}") or not filecmp.cmp(
-            f"{signing_event_dir}/{fname}", f"{known_good_dir}/{fname}", shallow=False
-        ):
-            if fname in ["timestamp.json", "snapshot.json"]:
-                raise RuntimeError("Unexpected change in online files")
-
-            changed_roles.append(fname[: -len(".json")])
-
-    # reorder, toplevels first
-    for toplevel in ["targets", "root"]:
-        if toplevel in changed_roles:
-            changed_roles.remove(toplevel)
-            changed_roles.insert(0, toplevel)
-
+        # filecmp compares file sizes before reading contents
+        try:
+            if filecmp.cmp(
+                f"{signing_event_dir}/{fname}",
+                f"{known_good_dir}/{fname}",
+                shallow=False,
+            ):
+                continue
+        except FileNotFoundError:
+            pass
+
+        if fname in ["timestamp.json", "snapshot.json"]:
+            raise RuntimeError("Unexpected change in online files")
+
+        changed_roles.append(fname[: -len(".json")])
+
+    # toplevels first (root, then targets), then other roles in name order
+    changed_roles.sort(key=lambda role: (_ROLE_ORDER.get(role, 2), role))
     return changed_roles
 
 
@@ -112,13 +121,20 @@ class SignerRepository(Repository):
         self._get_secret = secret_func
         self._invites: dict[str, list[str]] = {}
         self._signers: dict[str, Signer] = {}
+        # parsed metadata cache: rolename -> ((file mtime, file size), metadata)
+        self._md_cache: dict[str, tuple[tuple[int, int], Metadata]] = {}
+        # known good caches: known good state does not change during a run
+        self._known_good_md: dict[str, Metadata | None] = {}
+        self._known_good_keys: dict[str, list[Key]] = {}
 
         # read signing event state file (invites)
         state_file = os.path.join(self._dir, ".signing-event-state")
-        if os.path.exists(state_file):
-            with open(state_file) as f:
-                config = json.load(f)
+        try:
+            with open(state_file, "rb") as f:
+                config = json.loads(f.read())
             self._invites = config["invites"]
+        except FileNotFoundError:
+            pass
 
         # Figure out needed signatures
         self.unsigned = []
@@ -147,13 +163,17 @@ class SignerRepository(Repository):
     def _user_signature_needed(self, rolename: str) -> bool:
         """Return true if current role metadata is unsigned by user"""
         md = self.open(rolename)
+        # signed payload is the same for all keys: serialize it only once
+        payload = _CANONICAL.serialize(md.signed)
         for key in self._get_keys(rolename):
             keyowner = key.unrecognized_fields["x-playground-keyowner"]
             if keyowner == self.user_name:
+                sig = md.signatures.get(key.keyid)
+                if sig is None or not sig.signature:
+                    return True
                 try:
-                    payload = CanonicalJSONSerializer().serialize(md.signed)
-                    key.verify_signature(md.signatures[key.keyid], payload)
-                except (KeyError, UnverifiedSignatureError):
+                    key.verify_signature(sig, payload)
+                except UnverifiedSignatureError:
                     return True
 
         # Root signers for previous root version are eligible to sign
@@ -162,10 +182,12 @@ class SignerRepository(Repository):
             for key in self._get_keys(rolename, True):
                 keyowner = key.unrecognized_fields["x-playground-keyowner"]
                 if keyowner == self.user_name:
+                    sig = md.signatures.get(key.keyid)
+                    if sig is None or not sig.signature:
+                        return True
                     try:
-                        payload = CanonicalJSONSerializer().serialize(md.signed)
-                        key.verify_signature(md.signatures[key.keyid], payload)
-                    except (KeyError, UnverifiedSignatureError):
+                        key.verify_signature(sig, payload)
+                    except UnverifiedSignatureError:
                         return True
 
         return False
@@ -179,44 +201,62 @@ class SignerRepository(Repository):
     def _known_good_version(self, rolename: str) -> int:
         """Return the version of `rolename` in the known-good repository state"""
         prev_path = os.path.join(self._prev_dir, f"{rolename}.json")
-        if os.path.exists(prev_path):
+        try:
+            # only the version is needed: skip building the Metadata object
+            with open(prev_path, "rb") as f:
+                return json.loads(f.read())["signed"]["version"]
+        except FileNotFoundError:
+            return 0
+
+    def _open_known_good(self, rolename: str) -> Metadata | None:
+        """Return metadata from the known-good repository state (if it exists)
+
+        The returned metadata is shared between callers and must not be modified.
+        """
+        if rolename in self._known_good_md:
+            return self._known_good_md[rolename]
+
+        prev_path = os.path.join(self._prev_dir, f"{rolename}.json")
+        md: Metadata | None
+        try:
             with open(prev_path, "rb") as f:
                 md = Metadata.from_bytes(f.read())
-            return md.signed.version
+        except FileNotFoundError:
+            md = None
 
-        return 0
+        self._known_good_md[rolename] = md
+        return md
 
     def _known_good_root(self) -> Root:
         """Return the Root object from the known-good repository state"""
-        prev_path = os.path.join(self._prev_dir, "root.json")
-        if os.path.exists(prev_path):
-            with open(prev_path, "rb") as f:
-                md = Metadata.from_bytes(f.read())
-            assert isinstance(md.signed, Root)
-            return md.signed
-        else:
+        md = self._open_known_good("root")
+        if md is None:
             # this role did not exist: return an empty one for comparison purposes
             return Root()
 
+        assert isinstance(md.signed, Root)
+        return md.signed
+
     def _known_good_targets(self, rolename: str) -> Targets:
         """Return a Targets object from the known-good repository state"""
-        prev_path = os.path.join(self._prev_dir, f"{rolename}.json")
-        if os.path.exists(prev_path):
-            with open(prev_path, "rb") as f:
-                md = Metadata.from_bytes(f.read())
-            assert isinstance(md.signed, Targets)
-            return md.signed
-        else:
+        md = self._open_known_good(rolename)
+        if md is None:
             # this role did not exist: return an empty one for comparison purposes
             return Targets()
 
+        assert isinstance(md.signed, Targets)
+        return md.signed
+
     def _get_keys(self, role: str, known_good: bool = False) -> list[Key]:
         """Return public keys for delegated role
 
         If known_good is True, use the keys defined in known good delegator.
         Otherwise use keys defined in the signing event delegator.
         """
-        if role in ["root", "timestamp", "snapshot", "targets"]:
+        if known_good and role in self._known_good_keys:
+            return list(self._known_good_keys[role])
+
+        if role in _TOP_LEVEL_ROLES:
             if known_good:
                 delegator: Root | Targets = self._known_good_root()
             else:
@@ -234,6 +274,9 @@ class SignerRepository(Repository):
                 keys.append(delegator.get_key(keyid))
             except ValueError:
                 pass
+
+        if known_good:
+            self._known_good_keys[role] = list(keys)
         return keys
 
     def _sign(self, role: str, md: Metadata, key: Key) -> None:
@@ -265,7 +308,7 @@ class SignerRepository(Repository):
 
         os.makedirs(os.path.join(self._dir, "root_history"), exist_ok=True)
 
-        data = md.to_bytes(JSONSerializer())
+        data = md.to_bytes(_JSON)
         with open(filename, "wb") as f:
             f.write(data)
 
@@ -274,25 +317,55 @@ class SignerRepository(Repository):
             with open(self._get_versioned_root_filename(md.signed.version), "wb") as f:
                 f.write(data)
 
+        self._md_cache.pop(role, None)
+
     def open(self, role: str) -> Metadata:
-        """Read metadata from repository directory, or create new metadata"""
+        """Read metadata from repository directory, or create new metadata
+
+        Existing metadata is cached as long as the file is not modified: the
+        returned metadata should only be modified before it is written.
+        """
         fname = self._get_filename(role)
+        try:
+            st: os.stat_result | None = os.stat(fname)
+        except FileNotFoundError:
+            st = None
+
+        if st is not None:
+            file_sig = (st.st_mtime_ns, st.st_size)
+            cached = self._md_cache.get(role)
+            if cached and cached[0] == file_sig:
+                return cached[1]
 
-        if not os.path.exists(fname):
-            if role in ["snapshot", "timestamp"]:
-                raise ValueError(f"Cannot create {role}")
-            if role == "root":
-                md: Metadata = Metadata(Root())
-            else:
-                md = Metadata(Targets())
-            md.signed.unrecognized_fields["x-playground-expiry-period"] = 0
-            md.signed.unrecognized_fields["x-playground-signing-period"] = 0
-        else:
             with open(fname, "rb") as f:
-                md = Metadata.from_bytes(f.read())
+                md: Metadata = Metadata.from_bytes(f.read())
+            self._md_cache[role] = (file_sig, md)
+            return md
+
+        if role in _ONLINE_ROLES:
+            raise ValueError(f"Cannot create {role}")
+        if role == "root":
+            md = Metadata(Root())
+        else:
+            md = Metadata(Targets())
+        md.signed.unrecognized_fields["x-playground-expiry-period"] = 0
+        md.signed.unrecognized_fields["x-playground-signing-period"] = 0
 
         return md
 
+    @contextmanager
+    def edit(self, role: str) -> Generator[Signed, None, None]:
+        """Implementation of Repository.edit() that keeps the metadata cache valid
+
+        The edit modifies cached metadata: drop it from cache whether the edit
+        was stored or aborted.
+        """
+        try:
+            with super().edit(role) as signed:
+                yield signed
+        finally:
+            self._md_cache.pop(role, None)
+
     def close(self, role: str, md: Metadata) -> None:
         """Write metadata to a file in the repository directory
 
@@ -304,16 +377,15 @@ class SignerRepository(Repository):
 
         # Set expiry based on custom metadata
         days = md.signed.unrecognized_fields["x-playground-expiry-period"]
-        md.signed.expires = datetime.utcnow() + timedelta(days=days)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        md.signed.expires = now + timedelta(days=days)
 
         # figure out if there are open invites to delegations of this role
-        open_invites = False
-        delegated = self._get_delegated_rolenames(md)
-        for invited_roles in self._invites.values():
-            for invited_role in invited_roles:
-                if invited_role in delegated:
-                    open_invites = True
-                    break
+        delegated = set(self._get_delegated_rolenames(md))
+        open_invites = any(
+            not delegated.isdisjoint(invited_roles)
+            for invited_roles in self._invites.values()
+        )
 
         if role == "root":
             # special case: root includes its own signing keys. We want
@@ -424,7 +496,7 @@ class SignerRepository(Repository):
 
     def get_role_config(self, rolename: str) -> OfflineConfig | None:
         """Read configuration for delegation and role from metadata"""
-        if rolename in ["timestamp", "snapshot"]:
+        if rolename in _ONLINE_ROLES:
             raise ValueError("online roles not supported")
 
         if rolename == "root":
@@ -466,7 +538,7 @@ class SignerRepository(Repository):
         """Store delegation & role configuration in metadata.
 
         signing_key is only used if user is configured as signer"""
-        if rolename in ["timestamp", "snapshot"]:
+        if rolename in _ONLINE_ROLES:
             raise ValueError("online roles not supported")
 
         # Remove invites for the role
@@ -512,13 +584,13 @@ class SignerRepository(Repository):
                 delegator.delegations.roles[rolename] = role
                 changed = True
 
-            for keyid in role.keyids:
+            # iterate a copy: revoke_key() modifies role.keyids
+            for keyid in role.keyids.copy():
                 key = delegator.get_key(keyid)
-                if key.unrecognized_fields["x-playground-keyowner"] in config.signers:
+                keyowner = key.unrecognized_fields["x-playground-keyowner"]
+                if keyowner in config.signers:
                     # signer is still a signer
-                    config.signers.remove(
-                        key.unrecognized_fields["x-playground-keyowner"]
-                    )
+                    config.signers.remove(keyowner)
                 else:
                     # signer was removed
                     delegator.revoke_key(keyid, rolename)
@@ -568,11 +640,17 @@ class SignerRepository(Repository):
 
         state_file_path = os.path.join(self._dir, ".signing-event-state")
         if self._invites:
-            with open(state_file_path, "w") as f:
+            # write a temporary file first: state file is never left partially written
+            tmp_path = f"{state_file_path}.tmp"
+            with open(tmp_path, "w") as f:
                 state_file = {"invites": self._invites}
                 f.write(json.dumps(state_file, indent=2))
-        elif os.path.exists(state_file_path):
-            os.remove(state_file_path)
+            os.replace(tmp_path, state_file_path)
+        else:
+            try:
+                os.remove(state_file_path)
+            except FileNotFoundError:
+                pass
 
     def _role_status_lines(self, rolename: str) -> list[str]:
         # Handle a custom metadata: expiry and signing period
@@ -610,7 +688,7 @@ class SignerRepository(Repository):
         # (think keyid staying the same but public key bytes changing)
 
         def _get_signer_name(key: Key) -> str:
-            if name in ["timestamp", "snapshot"]:
+            if name in _ONLINE_ROLES:
                 # there's no "signer" in the online case: use signing system as signer
                 uri = key.unrecognized_fields["x-playground-online-uri"]
                 return uri.split(":")[0]
@@ -686,7 +764,8 @@ class SignerRepository(Repository):
             return []
 
         output = []
-        old_artifacts = self._known_good_targets(rolename).targets
+        # copy: known good metadata is shared, entries are removed below
+        old_artifacts = dict(self._known_good_targets(rolename).targets)
         artifacts = self.targets(rolename).targets
         for artifact in artifacts.values():
             if artifact.path not in old_artifacts:
@@ -701,7 +780,7 @@ class SignerRepository(Repository):
         return output
 
     def status(self, rolename: str) -> str:
-        if rolename in ["timestamp", "snapshot"]:
+        if rolename in _ONLINE_ROLES:
             raise ValueError("Cannot handle changes in online roles")
 
         output = [""]
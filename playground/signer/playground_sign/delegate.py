@@ -24,6 +24,7 @@ from playground_sign._common import (
     get_signing_key_input,
     git_echo,
     git_expect,
+    git_toplevel,
     signing_event,
 )
 from playground_sign._signer_repository import (
@@ -319,7 +320,7 @@ def delegate(verbose: int, push: bool, event_name: str, role: str | None):
     """Tool for modifying Repository Playground delegations."""
     logging.basicConfig(level=logging.WARNING - verbose * 10)
 
-    toplevel = git_expect(["rev-parse", "--show-toplevel"])
+    toplevel = git_toplevel()
     settings_path = os.path.join(toplevel, ".playground-sign.ini")
     user_config = SignerConfig(settings_path)
 
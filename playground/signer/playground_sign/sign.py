@@ -13,6 +13,7 @@ from playground_sign._common import (
     get_signing_key_input,
     git_echo,
     git_expect,
+    git_toplevel,
     signing_event,
 )
 from playground_sign._signer_repository import SignerState
@@ -28,7 +29,7 @@ def sign(verbose: int, push: bool, event_name: str):
     """Signing tool for Repository Playground signing events."""
     logging.basicConfig(level=logging.WARNING - verbose * 10)
 
-    toplevel = git_expect(["rev-parse", "--show-toplevel"])
+    toplevel = git_toplevel()
     settings_path = os.path.join(toplevel, ".playground-sign.ini")
     user_config = SignerConfig(settings_path)
 